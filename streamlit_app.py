@@ -1,76 +1,319 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import requests
 import io
+import contextlib
+import hashlib
+import os
+import re
+import tempfile
+import time
 from datetime import datetime, timezone
-from scipy.signal import savgol_filter
 
 # --- 1. 공식 공개 데이터 대시보드 (전 지구 이산화탄소 농도) --- 
 
 # 데이터 출처: Scripps Institution of Oceanography, UC San Diego
 # URL: https://scrippsco2.ucsd.edu/data/atmospheric_co2/primary_mlo_co2_record.html
 DATA_URL = "https://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/in_situ_co2/monthly/monthly_in_situ_co2_mlo.csv"
+REQUEST_TIMEOUT = 10  # 초
 
-@st.cache_data(ttl=3600)  # 1시간 동안 캐시
+# 머리말 다음에 오는 첫 번째 데이터 줄(연도, 월로 시작)을 찾는 정규식
+# 머리말은 큰따옴표로 감싼 설명 줄과, 따옴표 없는 열 제목/단위 줄(`  Yr, Mn, ...`, `    ,   ,  Excel, ...`)로 이루어져 있습니다.
+DATA_START_RE = re.compile(rb'^[ \t]*\d{4}[ \t]*,?[ \t]*\d{1,2}[ \t]*[, \t]', re.M)
+
+# 서버 재시작 후에도 재사용하는 디스크 캐시 (Parquet)
+# 디스크 캐시의 유효 기간과 메모리 캐시(st.cache_data)의 ttl이 겹치므로, 재시작 직후 읽은 디스크 캐시가
+# 메모리에 다시 1시간 머물 수 있어 화면의 데이터는 최대 약 2시간 전 것일 수 있습니다.
+CACHE_TTL = 3600  # 1시간
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".vips_cache", "scripps_co2.parquet")
+
+# 추세선(Savitzky-Golay) 파라미터
+SMOOTHING_WINDOW = 11
+SMOOTHING_POLYORDER = 2
+
+# 디스크 캐시에 저장하는 데이터 형식 버전. 전처리나 열 구성을 바꾸면 앞 번호를 올려 이전 캐시를 버립니다.
+CACHE_SCHEMA = f"1-sg{SMOOTHING_WINDOW}-{SMOOTHING_POLYORDER}"
+
+def _savgol_matrix(window, polyorder):
+    """창 안의 각 위치에서 다항식 최소제곱 적합값을 내는 (window x window) Savitzky-Golay 계수 행렬을 만듭니다."""
+    t = np.arange(window) - window // 2
+    vander = np.vander(t, polyorder + 1)
+    return vander @ np.linalg.pinv(vander)
+
+# 가운데 행은 대칭 합성곱 계수, 나머지 행은 양 끝 구간용 비대칭 계수입니다. (모듈 로드 시 한 번만 계산)
+SG_MATRIX = _savgol_matrix(SMOOTHING_WINDOW, SMOOTHING_POLYORDER)
+
+# 차트 한 트레이스당 브라우저로 보낼 최대 점 개수 (이보다 많으면 M4 다운샘플링)
+PLOT_MAX_POINTS = 2000
+
+# 기간별 CSV 내보내기 캐시에 보관할 최대 항목 수
+EXPORT_CACHE_MAX_ENTRIES = 64
+
+# 선택 기간이 이 연수보다 길면 월별 값 대신 연간 평균선과 최소~최대 범위로 요약해 그립니다.
+ENVELOPE_MIN_YEARS = 5
+
+def _read_disk_cache():
+    """디스크 캐시를 읽어 (데이터프레임, 유효 기간(CACHE_TTL) 이내 여부)를 반환합니다.
+
+    캐시가 없거나 현재 코드의 형식(CACHE_SCHEMA)과 다르면 (None, False)를 반환합니다.
+    """
+    try:
+        mtime = os.path.getmtime(CACHE_PATH)
+        df = pd.read_parquet(CACHE_PATH)
+        if df.attrs.get('schema') != CACHE_SCHEMA:
+            return None, False
+        return df, time.time() - mtime < CACHE_TTL
+    except Exception:
+        return None, False
+
+def _touch_disk_cache():
+    """서버 데이터가 바뀌지 않았을 때 디스크 캐시의 유효 기간을 갱신합니다."""
+    try:
+        os.utime(CACHE_PATH)
+    except OSError:
+        pass
+
+def _write_disk_cache(df):
+    """전처리된 데이터프레임을 디스크 캐시에 저장합니다. 실패해도 앱 동작에는 영향을 주지 않습니다.
+
+    다른 프로세스가 쓰다 만 파일을 읽지 않도록 같은 디렉터리의 임시 파일에 쓴 뒤 os.replace로 한 번에 교체합니다.
+    """
+    tmp_path = None
+    try:
+        cache_dir = os.path.dirname(CACHE_PATH)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.parquet.tmp')
+        os.close(fd)
+        df.to_parquet(tmp_path, compression='zstd', index=False)
+        os.replace(tmp_path, CACHE_PATH)
+    except Exception:
+        if tmp_path is not None:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+
+@st.cache_resource
+def _http_session():
+    """연결을 재사용(keep-alive)하는 HTTP 세션을 프로세스당 하나만 만듭니다. (압축 전송은 requests 기본 Accept-Encoding으로 요청)"""
+    return requests.Session()
+
+@st.cache_data(ttl=CACHE_TTL)  # 1시간 동안 캐시
 def load_public_data():
     """Scripps CO2 데이터를 로드하고 전처리합니다."""
+    # 0. 서버가 재시작되어도 1시간 이내에 저장한 디스크 캐시가 있으면 네트워크 요청 없이 사용합니다.
+    cached_df, is_fresh = _read_disk_cache()
+    if is_fresh:
+        return cached_df, None
+
     try:
-        # 1. 먼저 requests로 파일 내용을 텍스트로 가져옵니다.
-        response = requests.get(DATA_URL)
+        # 1. 먼저 requests로 파일 내용을 바이트로 가져옵니다.
+        #    만료된 캐시에 ETag가 있으면 조건부 요청을 보내, 변경이 없으면(304) 다운로드와 파싱을 모두 건너뜁니다.
+        headers = {}
+        if cached_df is not None and cached_df.attrs.get('etag'):
+            headers['If-None-Match'] = cached_df.attrs['etag']
+        response = _http_session().get(DATA_URL, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            _touch_disk_cache()
+            return cached_df, None
         response.raise_for_status()
-        lines = response.text.splitlines()
-
-        # 2. 주석이 아닌, 실제 데이터가 시작되는 첫 번째 줄을 찾습니다.
-        data_start_line = 0
-        for i, line in enumerate(lines):
-            if line.strip() and not line.strip().startswith('"'):
-                data_start_line = i
-                break
-        
-        # 3. 데이터 부분만 추출하여 pandas로 읽습니다.
-        csv_data = "\n".join(lines[data_start_line:])
+
+        # 2. 정규식 한 번으로 실제 데이터가 시작되는 위치를 찾아 머리말 전체(따옴표 주석, 열 제목/단위 줄)를 건너뜁니다.
+        content = response.content
+        match = DATA_START_RE.search(content)
+        if match is None:
+            raise ValueError("데이터 시작 줄을 찾을 수 없습니다.")
+
+        # 3. 데이터 부분의 바이트를 그대로 pandas로 읽습니다.
+        #    데이터 중간에 섞인 큰따옴표(") 주석 줄은 comment 옵션으로 건너뜁니다.
+        #    Scripps 파일은 쉼표로 구분하고 값 앞을 공백으로 정렬하므로 skipinitialspace로 읽고,
+        #    첫 데이터 줄의 월 뒤 구분자(정규식이 함께 잡음)가 쉼표가 아니면 공백 구분 형식으로 읽습니다.
+        #    전체 10개 열 중 연도(0), 월(1), CO2 농도(4)만 읽습니다.
+        sep_options = {'sep': ',', 'skipinitialspace': True} if b',' in match.group(0) else {'sep': r'\s+'}
         df = pd.read_csv(
-            io.StringIO(csv_data),
-            delim_whitespace=True, 
+            io.BytesIO(content[match.start():]),
+            **sep_options,
+            comment='"',
             header=None,
-            on_bad_lines='skip' 
+            usecols=[0, 1, 4],
+            names=['year', 'month', 'value'],
+            dtype=str,
+            on_bad_lines='skip',
+            engine='c'
         )
-        
-        # 열 이름 지정
-        df.columns = ["year", "month", "date_excel", "date_decimal", "value", "seasonally_adjusted", "fit", "seasonally_adjusted_fit", "co2_filled", "seasonally_adjusted_filled"]
-        
-
-    df = df[['year', 'month', 'value']].copy()
 
-    # 'year' 컬럼이 숫자인 행만 남깁니다 (헤더 등 제거)
-    df = df[df['year'].apply(lambda x: str(x).isdigit())]
+        # 숫자가 아닌 토큰이 있는 행은 전체 로드를 실패시키지 않고 그 행만 버린 뒤 좁은 dtype으로 바꿉니다.
+        df = df.apply(pd.to_numeric, errors='coerce').dropna()
+        df = df[df['month'].between(1, 12)]
+        df = df.astype({'year': 'int16', 'month': 'int8', 'value': 'float32'})
 
-    # -99.99는 결측치를 의미하므로 제거합니다.
-    df = df[df['value'] != -99.99]
+        # -99.99는 결측치를 의미하므로 제거합니다. (float32 열이므로 같은 정밀도로 비교)
+        df = df[df['value'] != np.float32(-99.99)]
 
-    # 날짜(date) 열 생성
-    df['date'] = pd.to_datetime(df['year'].astype(str) + '-' + df['month'].astype(str))
+        # 날짜(date) 열 생성
+        df = df.assign(date=pd.to_datetime(df['year'].astype(str) + '-' + df['month'].astype(str)))
         
-        # 필요한 열만 선택
-        df = df[['date', 'value']]
+        # 필요한 열만 선택하고 날짜순으로 정렬 (대시보드의 이진 탐색 필터링에 필요)
+        df = df[['date', 'value']].sort_values('date')
         
-        # 오늘(로컬 자정) 이후 데이터 제거 (현재 시간 기준)
-        today = datetime.now(timezone.utc).date()
-        df = df[df['date'].dt.date < today]
+        # 오늘(UTC 자정) 이후 데이터 제거 (datetime64끼리 벡터 비교)
+        today = pd.Timestamp.now(tz='UTC').tz_localize(None).normalize()
+        df = df[df['date'] < today]
         
+        df = _add_smoothed(df)
+        df.attrs['schema'] = CACHE_SCHEMA
+        etag = response.headers.get('ETag')
+        df.attrs['etag'] = etag
+        # 캐시 키로 쓸 데이터 버전 (ETag가 없으면 응답 본문 해시)
+        df.attrs['version'] = etag or hashlib.md5(content).hexdigest()
+        _write_disk_cache(df)
         return df, None # 성공 시 데이터프레임과 None 반환
 
     except Exception as e:
         error_message = f"데이터를 불러오는 데 실패했습니다: {e}"
+        # 만료되었더라도 디스크 캐시에 실제 데이터가 있으면 예시 데이터 대신 사용합니다.
+        if cached_df is not None:
+            return cached_df, error_message
+
         # 예시 데이터 생성
         date_rng = pd.date_range(start='1958-03-01', end='2024-01-01', freq='MS')
-        co2_data = [315.71 + 0.005 * i**2 + 2 * (i % 12) for i in range(len(date_rng))]
-        example_df = pd.DataFrame(date_rng, columns=['date'])
-        example_df['value'] = co2_data
+        idx = np.arange(len(date_rng), dtype=np.float64)
+        co2_data = (315.71 + 0.005 * idx * idx + 2.0 * (idx.astype(np.int64) % 12)).astype(np.float32)
+        example_df = _add_smoothed(pd.DataFrame({'date': date_rng, 'value': co2_data}))
+        example_df.attrs['version'] = 'example'
         return example_df, error_message
 
+def _add_smoothed(df):
+    """전체 시계열에 Savitzky-Golay 추세선을 한 번만 계산해 'smoothed' 열로 추가합니다."""
+    df = df.reset_index(drop=True)
+    if len(df) > SMOOTHING_WINDOW:
+        df['smoothed'] = _savgol_smooth(df['value'].values)
+    return df
+
+def _savgol_smooth(values):
+    """미리 계산한 SG_MATRIX로 Savitzky-Golay 필터를 적용합니다. (scipy savgol_filter의 mode='interp'와 동일)"""
+    v = np.asarray(values, dtype=np.float64)
+    half = SMOOTHING_WINDOW // 2
+    out = np.empty_like(v)
+    out[half:-half] = np.convolve(v, SG_MATRIX[half][::-1], mode='valid')
+    out[:half] = SG_MATRIX[:half] @ v[:SMOOTHING_WINDOW]
+    out[-half:] = SG_MATRIX[half + 1:] @ v[-SMOOTHING_WINDOW:]
+    return out.astype(values.dtype, copy=False)
+
+def _m4_downsample(x, y, max_points=PLOT_MAX_POINTS):
+    """M4 방식으로 다운샘플링합니다. 구간마다 첫/마지막/최소/최대 점만 남겨 선 모양을 유지하면서 점 개수를 줄입니다."""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(y)
+    if n <= max_points:
+        return x, y
+
+    # 한 구간에 4개 점을 남기므로 max_points // 4개의 구간으로 나눕니다.
+    size = -(-n // (max_points // 4))
+    n_bins = -(-n // size)
+    blocks = np.full(n_bins * size, np.nan)
+    blocks[:n] = y
+    blocks = blocks.reshape(n_bins, size)
+
+    starts = np.arange(n_bins) * size
+    idx = np.unique(np.concatenate([
+        starts,
+        starts + np.nanargmin(blocks, axis=1),
+        starts + np.nanargmax(blocks, axis=1),
+        np.minimum(starts + size, n) - 1,
+    ]))
+    return x[idx], y[idx]
+
+def _yearly_envelope(dates, values):
+    """날짜순으로 정렬된 월별 값을 연도별 (연중 시점, 최솟값, 최댓값, 평균)으로 요약합니다.
+
+    1~12월 값이 모두 있는 연도만 남깁니다. 1958년(3월 시작), 결측 월이 있는 해, 아직 끝나지 않은 올해, 연중에 잘린
+    선택 기간처럼 일부 월만 있는 연도는 계절 변동 때문에 평균과 범위가 치우치기 때문입니다.
+    """
+    years = dates.astype('datetime64[Y]')
+    unique_years, starts = np.unique(years, return_index=True)
+    counts = np.diff(np.append(starts, len(values)))
+    values = np.asarray(values, dtype=np.float64)
+    complete = counts == 12  # 한 해에 같은 달은 한 번만 있으므로 12개면 1~12월이 모두 있음
+
+    x = unique_years.astype('datetime64[M]') + np.timedelta64(6, 'M')  # 연중(7월 1일)에 표시
+    y_min = np.minimum.reduceat(values, starts)
+    y_max = np.maximum.reduceat(values, starts)
+    y_mean = np.add.reduceat(values, starts) / counts
+    return x[complete].astype('datetime64[ns]'), y_min[complete], y_max[complete], y_mean[complete]
+
+def _to_csv_bytes(df):
+    """pyarrow의 C++ CSV 작성기로 데이터프레임을 UTF-8 CSV 바이트로 변환합니다."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # 날짜 열은 pandas to_csv와 같이 시각 없이 날짜만 기록합니다.
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, pc.cast(table[field.name], pa.date32()))
+
+    buf = io.BytesIO()
+    buf.write((','.join(table.column_names) + '\n').encode('utf-8'))
+    pacsv.write_csv(table, buf, pacsv.WriteOptions(include_header=False))
+    return buf.getvalue()
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=EXPORT_CACHE_MAX_ENTRIES)  # 기간 조합마다 쌓이지 않도록 개수와 시간 제한
+def _public_export(_filtered_df, version, start_date, end_date, use_smoothing):
+    """공개 데이터의 다운로드용 CSV 바이트를 만듭니다.
+
+    데이터프레임 인자는 밑줄(_)로 시작해 해싱에서 제외되므로, 캐시 키는 데이터 버전과 기간, 옵션 같은 원시값만으로 정해집니다.
+    """
+    return _to_csv_bytes(_filtered_df)
+
+# _build_public_fig()의 레이아웃이나 트레이스 구성을 바꾸면 올려서, 세션에 남아 있는 이전 차트를 다시 만들게 합니다.
+PUBLIC_FIG_VERSION = 2
+
+def _build_public_fig():
+    """킬링 곡선 차트의 레이아웃과 트레이스(원본, 연간 최댓값/최솟값/평균, 추세선)를 데이터 없이 만듭니다."""
+    fig = go.Figure()
+    fig.add_traces([
+        go.Scattergl(
+            mode='lines', 
+            name='월별 CO2 농도',
+            line=dict(color='lightblue', width=1)
+        ),
+        # 긴 기간용 연간 요약: 최댓값(경계선) -> 최솟값(최댓값까지 채움) -> 평균 순서여야 fill='tonexty'가 동작합니다.
+        go.Scattergl(
+            mode='lines', 
+            name='연간 최댓값',
+            line=dict(width=0),
+            showlegend=False,
+            hoverinfo='skip'
+        ),
+        go.Scattergl(
+            mode='lines', 
+            name='연간 최소~최대 범위',
+            line=dict(width=0),
+            fill='tonexty',
+            fillcolor='rgba(135,206,235,0.3)'
+        ),
+        go.Scattergl(
+            mode='lines', 
+            name='연평균 CO2 농도',
+            line=dict(color='deepskyblue', width=2)
+        ),
+        go.Scattergl(
+            mode='lines', 
+            name='추세선 (Smoothed)',
+            line=dict(color='royalblue', width=3)
+        ),
+    ])
+    fig.update_layout(
+        title="월별 CO2 농도 변화 추이 (킬링 곡선)",
+        xaxis_title="연도",
+        yaxis_title="CO2 농도 (ppm)",
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        margin=dict(l=40, r=40, t=80, b=40)
+    )
+    return fig
+
 def create_public_data_dashboard(df):
     """공개 데이터로 대시보드를 생성합니다."""
     st.subheader("Scripps 기관의 전 지구 CO2 농도 변화 🌎")
@@ -81,8 +324,9 @@ def create_public_data_dashboard(df):
 
     # --- 사이드바 옵션 ---
     st.sidebar.header("공개 데이터 옵션")
-    min_date = df['date'].min().date()
-    max_date = df['date'].max().date()
+    # 날짜순으로 정렬되어 있으므로 첫/마지막 행이 최소/최대 날짜입니다.
+    min_date = df['date'].iloc[0].date()
+    max_date = df['date'].iloc[-1].date()
     
     start_date, end_date = st.sidebar.date_input(
         "기간 선택",
@@ -96,103 +340,124 @@ def create_public_data_dashboard(df):
         st.sidebar.error("시작일이 종료일보다 늦을 수 없습니다.")
         return
 
-    # 데이터 필터링
-    filtered_df = df[(df['date'].dt.date >= start_date) & (df['date'].dt.date <= end_date)].copy()
-
     use_smoothing = st.sidebar.checkbox("추세선 스무딩", value=True, key="public_smoothing")
-    if use_smoothing and len(filtered_df) > 11:
-        # Savitzky-Golay 필터 적용
-        filtered_df['smoothed'] = savgol_filter(filtered_df['value'], window_length=11, polyorder=2)
+
+    # 데이터 필터링 (추세선은 load_public_data()에서 미리 계산된 열을 잘라서 사용)
+    columns = ['date', 'value']
+    if use_smoothing and 'smoothed' in df.columns:
+        columns.append('smoothed')
+    # 날짜가 정렬되어 있으므로 datetime64 배열에서 이진 탐색으로 구간 경계를 찾습니다.
+    dates = df['date'].values
+    lo = np.searchsorted(dates, np.datetime64(start_date))
+    hi = np.searchsorted(dates, np.datetime64(end_date) + np.timedelta64(1, 'D'))
+    filtered_df = df.iloc[lo:hi][columns]
     
     # --- 시각화 (Plotly) ---
-    fig = go.Figure()
-
-    # 원본 데이터
-    fig.add_trace(go.Scatter(
-        x=filtered_df['date'], 
-        y=filtered_df['value'], 
-        mode='lines', 
-        name='월별 CO2 농도',
-        line=dict(color='lightblue', width=1)
-    ))
-
-    # 스무딩된 추세선
-    if use_smoothing and 'smoothed' in filtered_df.columns:
-        fig.add_trace(go.Scatter(
-            x=filtered_df['date'], 
-            y=filtered_df['smoothed'], 
-            mode='lines', 
-            name='추세선 (Smoothed)',
-            line=dict(color='royalblue', width=3)
-        ))
-
-    fig.update_layout(
-        title="월별 CO2 농도 변화 추이 (킬링 곡선)",
-        xaxis_title="연도",
-        yaxis_title="CO2 농도 (ppm)",
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        margin=dict(l=40, r=40, t=80, b=40)
-    )
+    # 차트는 세션마다 한 번만 만들고, 재실행 시에는 트레이스의 데이터 배열만 바꿉니다.
+    # 코드가 다시 로드되어 세션의 차트가 이전 구성이면 새로 만듭니다.
+    fig = st.session_state.get('public_fig')
+    if fig is None or st.session_state.get('public_fig_version') != PUBLIC_FIG_VERSION:
+        fig = st.session_state['public_fig'] = _build_public_fig()
+        st.session_state['public_fig_version'] = PUBLIC_FIG_VERSION
+    raw_trace, max_trace, min_trace, mean_trace, smoothed_trace = fig.data
+
+    # pandas Series 대신 연속된 numpy 배열을 넘기고, 점이 많으면 화면 해상도 수준으로 다운샘플링합니다.
+    dates = filtered_df['date'].values
+    use_envelope = (end_date - start_date).days / 365 > ENVELOPE_MIN_YEARS
+    with fig.batch_update():
+        # 기간이 같으면 재실행(예: 스무딩 토글)되어도 사용자의 확대/이동 상태를 유지하고, 기간이 바뀌면 축을 새로 맞춥니다.
+        fig.layout.uirevision = f"{start_date}-{end_date}"
+
+        if use_envelope:
+            # 긴 기간: 1~12월 값이 모두 있는 연도의 연간 평균선과 최소~최대 범위 (계절 변동 폭은 범위로 유지)
+            fig.layout.title.text = "연간 CO2 농도 평균과 최소~최대 범위 (킬링 곡선)"
+            x, y_min, y_max, y_mean = _yearly_envelope(dates, filtered_df['value'].values)
+            raw_trace.update(x=[], y=[], visible=False)
+            max_trace.update(x=x, y=y_max, visible=True)
+            min_trace.update(x=x, y=y_min, visible=True)
+            mean_trace.update(x=x, y=y_mean, visible=True)
+        else:
+            # 짧은 기간: 원본 월별 데이터
+            fig.layout.title.text = "월별 CO2 농도 변화 추이 (킬링 곡선)"
+            x, y = _m4_downsample(dates, filtered_df['value'].values)
+            raw_trace.update(x=x, y=y, visible=True)
+            for trace in (max_trace, min_trace, mean_trace):
+                trace.update(x=[], y=[], visible=False)
+
+        # 스무딩된 추세선 (연간 요약에서는 연평균선이 추세를 보여 주므로 월별 점을 보내지 않음)
+        if use_smoothing and not use_envelope and 'smoothed' in filtered_df.columns:
+            x, y = _m4_downsample(dates, filtered_df['smoothed'].values)
+            smoothed_trace.update(x=x, y=y, visible=True)
+        else:
+            smoothed_trace.update(x=[], y=[], visible=False)
     
     st.plotly_chart(fig, use_container_width=True)
+    if use_envelope:
+        st.caption(f"선택 기간이 {ENVELOPE_MIN_YEARS}년보다 길어, 1~12월 값이 모두 있는 연도만 연간 평균과 최소~최대 범위로 요약해 표시합니다. "
+                   "(일부 월만 있는 해는 제외하며, 추세선은 연평균선으로 대신합니다)")
     
-    try:
-        # 1. 먼저 requests로 파일 내용을 텍스트로 가져옵니다.
-        response = requests.get(DATA_URL)
-        response.raise_for_status()
-        lines = response.text.splitlines()
-
-        # 2. 주석이 아닌, 실제 데이터가 시작되는 첫 번째 줄을 찾습니다.
-        data_start_line = 0
-        for i, line in enumerate(lines):
-            if line.strip() and not line.strip().startswith('"'):
-                data_start_line = i
-                break
-
-        # 3. 데이터 부분만 추출하여 pandas로 읽습니다.
-        csv_data = "\n".join(lines[data_start_line:])
-        df = pd.read_csv(
-            io.StringIO(csv_data),
-            delim_whitespace=True, 
-            header=None,
-            on_bad_lines='skip' 
-        )
-
-        # 열 이름 지정
-        df.columns = ["year", "month", "date_excel", "date_decimal", "value", "seasonally_adjusted", "fit", "seasonally_adjusted_fit", "co2_filled", "seasonally_adjusted_filled"]
-
-        df = df[['year', 'month', 'value']].copy()
-
-        # 'year' 컬럼이 숫자인 행만 남깁니다 (헤더 등 제거)
-        df = df[df['year'].apply(lambda x: str(x).isdigit())]
-
-        # -99.99는 결측치를 의미하므로 제거합니다.
-        df = df[df['value'] != -99.99]
-
-        # 날짜(date) 열 생성
-        df['date'] = pd.to_datetime(df['year'].astype(str) + '-' + df['month'].astype(str))
-
-        # 필요한 열만 선택
-        df = df[['date', 'value']]
-
-        # 오늘(로컬 자정) 이후 데이터 제거 (현재 시간 기준)
-        today = datetime.now(timezone.utc).date()
-        df = df[df['date'].dt.date < today]
-
-        return df, None # 성공 시 데이터프레임과 None 반환
-
-    except Exception as e:
-        error_message = f"데이터를 불러오는 데 실패했습니다: {e}"
-        # 예시 데이터 생성
-        date_rng = pd.date_range(start='1958-03-01', end='2024-01-01', freq='MS')
-        co2_data = [315.71 + 0.005 * i**2 + 2 * (i % 12) for i in range(len(date_rng))]
-        example_df = pd.DataFrame(date_rng, columns=['date'])
-        example_df['value'] = co2_data
-        return example_df, error_message
-    df = df[df['date'].dt.year < current_year]
+    # --- 데이터 내보내기 ---
+    st.markdown("##### 데이터 확인 및 다운로드")
     
+    # 소수점 둘째 자리 표시는 열을 반올림하지 않고 column_config 서식으로 처리합니다.
+    st.dataframe(
+        filtered_df,
+        column_config={
+            'value': st.column_config.NumberColumn(format='%.2f'),
+            'smoothed': st.column_config.NumberColumn(format='%.2f'),
+        },
+        use_container_width=True
+    )
+    
+    csv = _public_export(filtered_df, df.attrs['version'], start_date, end_date, use_smoothing)
+    
+    st.download_button(
+        label="처리된 데이터(CSV) 다운로드",
+        data=csv,
+        file_name='co2_processed.csv',
+        mime='text/csv',
+        key='public_download'
+    )
+
+# --- 2. 사용자 입력 데이터 대시보드 (지구 온도 편차와 CO2 농도) ---
+
+@st.cache_data
+def load_user_data():
+    """사용자 입력 데이터를 로드하고 전처리합니다."""
+    # 연도별 지구 온도 편차(°C, 1951-1980년 평균 대비)와 전 지구 평균 CO2 농도(ppm)
+    # 정적인 데이터이므로 CSV 문자열을 파싱하지 않고 numpy 배열에서 바로 데이터프레임을 만듭니다.
+    years = np.arange(2001, 2024, dtype=np.int16)
+    temp_anomaly = np.array([
+        0.54, 0.63, 0.62, 0.54, 0.68, 0.64, 0.66, 0.54, 0.65, 0.72, 0.61, 0.65,
+        0.68, 0.75, 0.90, 1.01, 0.92, 0.85, 0.98, 1.01, 0.85, 0.89, 1.17,
+    ], dtype=np.float32)
+    co2 = np.array([
+        370.57, 372.59, 375.15, 376.95, 378.98, 381.15, 382.90, 385.02, 386.50, 388.76, 390.63, 392.65,
+        395.40, 397.34, 399.65, 403.06, 405.22, 407.61, 410.07, 412.44, 414.70, 417.07, 419.31,
+    ], dtype=np.float32)
+
+    # 올해(미완료 연도) 이후 데이터 제거
+    current_year = datetime.now(timezone.utc).year
+    mask = years < current_year
+    years = years[mask]
+    df = pd.DataFrame({
+        'date': pd.to_datetime(pd.DataFrame({'year': years, 'month': 1, 'day': 1})),
+        'value': temp_anomaly[mask],
+        'group': co2[mask],
+    })
+
+    # 대시보드가 매 재실행마다 연도 열 전체를 훑지 않도록 최소/최대 연도를 함께 저장합니다.
+    df.attrs = {'min_year': int(years.min()), 'max_year': int(years.max())}
     return df
 
+@st.cache_data(max_entries=EXPORT_CACHE_MAX_ENTRIES)
+def _user_export(_filtered_df, start_year, end_year):
+    """사용자 데이터의 표시용 데이터프레임(열 이름 원복 및 연도만 표시)과 CSV 바이트를 만듭니다."""
+    display_df = _filtered_df.assign(date=_filtered_df['date'].dt.year).rename(
+        columns={'date': 'year', 'value': 'temp_anomaly', 'group': 'co2_concentration'}
+    )
+    return display_df, _to_csv_bytes(display_df)
+
 def create_user_data_dashboard(df):
     """사용자 데이터로 대시보드를 생성합니다."""
     st.subheader("지구 온도 편차와 CO2 농도 비교 🌡️")
@@ -203,8 +468,8 @@ def create_user_data_dashboard(df):
 
     # --- 사이드바 옵션 ---
     st.sidebar.header("사용자 데이터 옵션")
-    min_year = df['date'].dt.year.min()
-    max_year = df['date'].dt.year.max()
+    min_year = df.attrs['min_year']
+    max_year = df.attrs['max_year']
     
     start_year, end_year = st.sidebar.slider(
         "연도 선택",
@@ -214,7 +479,11 @@ def create_user_data_dashboard(df):
         key="user_year_range"
     )
 
-    filtered_df = df[(df['date'].dt.year >= start_year) & (df['date'].dt.year <= end_year)]
+    # 연도 경계를 datetime64로 바꿔 정렬된 날짜 배열에서 이진 탐색으로 구간을 자릅니다.
+    dates = df['date'].values
+    lo = np.searchsorted(dates, np.datetime64(str(start_year), 'Y'))
+    hi = np.searchsorted(dates, np.datetime64(str(end_year + 1), 'Y'))
+    filtered_df = df.iloc[lo:hi]
     
     # --- 시각화 (Plotly 이중 축) ---
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -229,7 +498,7 @@ def create_user_data_dashboard(df):
     ), secondary_y=False)
 
     # CO2 농도 (선 그래프)
-    fig.add_trace(go.Scatter(
+    fig.add_trace(go.Scattergl(
         x=filtered_df['date'], 
         y=filtered_df['group'],
         name='CO2 농도 (ppm)',
@@ -253,13 +522,17 @@ def create_user_data_dashboard(df):
     # --- 데이터 내보내기 ---
     st.markdown("##### 데이터 확인 및 다운로드")
     
-    # 표시용 데이터프레임 (열 이름 원복 및 연도만 표시)
-    display_df = filtered_df.copy()
-    display_df['date'] = display_df['date'].dt.year
-    display_df.rename(columns={'date': 'year', 'value': 'temp_anomaly', 'group': 'co2_concentration'}, inplace=True)
-    st.dataframe(display_df.style.format({'temp_anomaly': '{:.2f}', 'co2_concentration': '{:.2f}'}), use_container_width=True)
+    # 표시용 데이터프레임과 CSV는 연도 구간별로 캐시됩니다.
+    display_df, csv = _user_export(filtered_df, start_year, end_year)
+    st.dataframe(
+        display_df,
+        column_config={
+            'temp_anomaly': st.column_config.NumberColumn(format='%.2f'),
+            'co2_concentration': st.column_config.NumberColumn(format='%.2f'),
+        },
+        use_container_width=True
+    )
     
-    csv = display_df.to_csv(index=False).encode('utf-8')
     st.download_button(
         label="처리된 데이터(CSV) 다운로드",
         data=csv,
@@ -276,8 +549,10 @@ def main():
     st.markdown("---")
     st.header("1. 공식 공개 데이터 대시보드")
     public_df, error = load_public_data()
-    if error:
+    if error and public_df.attrs.get('version') == 'example':
         st.error(f"**데이터 로딩 오류:** {error}\n\n**참고:** 네트워크 문제로 실제 데이터를 가져올 수 없어, 내장된 예시 데이터로 대시보드를 표시합니다.")
+    elif error:
+        st.warning(f"**데이터 갱신 오류:** {error}\n\n**참고:** 최신 데이터를 가져올 수 없어, 마지막으로 저장된 데이터로 대시보드를 표시합니다.")
     create_public_data_dashboard(public_df)
     
     st.markdown("---")